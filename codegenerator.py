@@ -4,8 +4,9 @@ GÉNÉRATEUR SIMPLIFIÉ DE CODE ASTERISK
 Version minimaliste - Même algorithme
 """
 
+import functools
 import hashlib
-import hmac
+import time
 from datetime import datetime
 
 # CONFIGURATION IDENTIQUE
@@ -16,36 +17,72 @@ MONTH_NAMES = {
     9: "Septembre", 10: "Octobre", 11: "Novembre", 12: "Décembre"
 }
 
+CODE_LENGTH = 8
+ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+# Table octet -> caractère pour chaque position (le décalage +i y est intégré)
+_POSITION_TABLES = tuple(
+    bytes(ALPHABET[(byte_val + i) % len(ALPHABET)] for byte_val in range(256))
+    for i in range(CODE_LENGTH)
+)
+
+# États SHA-256 internes/externes du HMAC, dérivés une seule fois de la clé (RFC 2104)
+_HMAC_KEY = SECRET_SEED.encode('utf-8')
+if len(_HMAC_KEY) > 64:
+    _HMAC_KEY = hashlib.sha256(_HMAC_KEY).digest()
+_HMAC_KEY = _HMAC_KEY.ljust(64, b'\x00')
+_INNER_STATE = hashlib.sha256(bytes(b ^ 0x36 for b in _HMAC_KEY))
+_OUTER_STATE = hashlib.sha256(bytes(b ^ 0x5C for b in _HMAC_KEY))
+
+# Dernière période calculée et instant (epoch) du début du mois suivant
+_month_year_cache = (0.0, "")
+
+def current_month_year():
+    """Période courante au format MM-AAAA (recalculée seulement au changement de mois)"""
+    global _month_year_cache
+    valid_until, month_year = _month_year_cache
+    if time.time() < valid_until:
+        return month_year
+    
+    current_date = datetime.now()
+    month_year = f"{current_date.month:02d}-{current_date.year}"
+    next_month = datetime(current_date.year + current_date.month // 12, current_date.month % 12 + 1, 1)
+    _month_year_cache = (next_month.timestamp(), month_year)
+    return month_year
+
 def generate_code(month_year=None):
     """Génère le code d'accès - Même algorithme que le système principal"""
     if month_year is None:
-        current_date = datetime.now()
-        month_year = f"{current_date.month:02d}-{current_date.year}"
-    
-    hmac_obj = hmac.new(
-        SECRET_SEED.encode('utf-8'),
-        month_year.encode('utf-8'),
-        hashlib.sha256
-    )
-    
-    hash_bytes = hmac_obj.digest()
-    chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
-    code_chars = []
-    
-    for i in range(8):
-        byte_val = hash_bytes[i % len(hash_bytes)] + i
-        code_chars.append(chars[byte_val % len(chars)])
+        month_year = current_month_year()
+    return _generate_code(month_year)
+
+def batch_generate(month_years):
+    """Codes de plusieurs périodes (audit, aperçu de rotation), sans encombrer le cache"""
+    return [_compute_code(month_year) for month_year in month_years]
+
+def _compute_code(month_year):
+    """Calcul du code pour une période"""
+    inner = _INNER_STATE.copy()
+    inner.update(month_year.encode('utf-8'))
+    outer = _OUTER_STATE.copy()
+    outer.update(inner.digest())
     
-    return ''.join(code_chars)
+    hash_bytes = outer.digest()
+    return bytes(
+        table[byte_val] for table, byte_val in zip(_POSITION_TABLES, hash_bytes)
+    ).decode('ascii')
+
+# Version mise en cache (la période courante change une fois par mois)
+_generate_code = functools.lru_cache(maxsize=32)(_compute_code)
 
 if __name__ == "__main__":
     import sys
     
     if len(sys.argv) > 1:
-        # Code pour période spécifique
-        period = sys.argv[1]
-        code = generate_code(period)
-        print(f"Code {period}: {code}")
+        # Code pour une ou plusieurs périodes spécifiques
+        periods = sys.argv[1:]
+        for period, code in zip(periods, batch_generate(periods)):
+            print(f"Code {period}: {code}")
     else:
         # Code actuel
         current_date = datetime.now()
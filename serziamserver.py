@@ -6,15 +6,20 @@ Système de gestion professionnel avec création automatique des bases de donné
 
 import os
 import sys
+import functools
 import sqlite3
 import hashlib
 import hmac
 import subprocess
 import time
-from datetime import datetime, timedelta
-import string
+import calendar
+from datetime import datetime
 import random
 import getpass
+import shutil
+import atexit
+import threading
+import termios
 
 # =============================================================================
 # CONFIGURATION GLOBALE
@@ -22,6 +27,10 @@ import getpass
 
 class Config:
     DB_PATH = "/home/vps/asterisk/asterisk.db"
+    ACCESS_CODES_DB_PATH = "/home/vps/asterisk/access_codes.db"
+    SYSTEM_LOGS_DB_PATH = "/home/vps/asterisk/system_logs.db"
+    CDR_DB_PATH = "/home/vps/asterisk/cdr.db"
+    CONFIG_DB_PATH = "/home/vps/asterisk/config.db"
     SECRET_SEED = "asterisk_secure_deterministic_v1"
     ASTERISK_CONFIG_DIR = "/etc/asterisk"
     VENV_PATH = "/home/vps/asterisk"
@@ -29,33 +38,150 @@ class Config:
     # Configuration des extensions
     EXTENSION_PREFIX = "601"
     EXTENSION_LENGTH = 9
+    
+    # Pause (secondes) après un code correct, 0 = aucune
+    LOGIN_SUCCESS_DELAY = 0
+
+# Bases de données gérées (libellé, chemin)
+DATABASES = (
+    ("Principale", Config.DB_PATH),
+    ("Codes d'accès", Config.ACCESS_CODES_DB_PATH),
+    ("Logs système", Config.SYSTEM_LOGS_DB_PATH),
+    ("CDR", Config.CDR_DB_PATH),
+    ("Configuration", Config.CONFIG_DB_PATH),
+)
+
+# Mêmes bases avec leur touche de menu ("1", "2", ...)
+DATABASES_INDEXED = tuple((str(i), name, path) for i, (name, path) in enumerate(DATABASES, 1))
 
 # =============================================================================
 # SYSTÈME D'AFFICHAGE FORCÉ
 # =============================================================================
 
+class ScreenBuffer:
+    """Dernier écran affiché: seules les lignes modifiées sont réécrites au rendu suivant"""
+    
+    def __init__(self):
+        self.prev = []
+        self.size = None
+        # Lignes écrites sous l'écran depuis le dernier rendu (messages, saisies)
+        self.extra_rows = 0
+    
+    def invalidate(self):
+        self.prev = []
+    
+    def rows_of(self, text):
+        """Rangées descendues en écrivant `text` depuis le début d'une ligne (lignes repliées comprises)"""
+        cols = (self.size or shutil.get_terminal_size()).columns
+        return sum(max(1, -(-len(line) // cols)) for line in text.split('\n')) - 1
+    
+    def render(self, lines):
+        curr = '\n'.join(lines).split('\n')
+        size = shutil.get_terminal_size()
+        
+        # Repeindre entièrement si la correspondance ligne/rangée n'est plus sûre:
+        # premier écran, terminal redimensionné, défilement possible, ligne repliée
+        # (marge pour les emojis en double largeur)
+        full = (
+            not self.prev
+            or size != self.size
+            or len(self.prev) + self.extra_rows >= size.lines
+            or len(curr) >= size.lines
+            or any(len(line) > size.columns - 8 for line in curr)
+        )
+        
+        if full:
+            out = ["\x1b[H\x1b[2J", '\n'.join(curr), '\n']
+        else:
+            out = [
+                f"\x1b[{row};1H\x1b[2K{line}"
+                for row, line in enumerate(curr, 1)
+                if row > len(self.prev) or self.prev[row - 1] != line
+            ]
+            # Effacer sous l'écran: fin de l'ancien écran, anciens messages et saisies
+            out.append(f"\x1b[{len(curr) + 1};1H\x1b[J")
+        
+        Terminal.write_frame(''.join(out))
+        self.prev = curr
+        self.size = size
+        self.extra_rows = 0
+
 class Terminal:
     """Gestionnaire d'affichage terminal avec flush forcé"""
     
+    screen = ScreenBuffer()
+    
+    # stdout est en mode ligne (voir main()): pas de flush explicite par message
     @staticmethod
-    def print(message, end='\n', flush=True):
-        sys.stdout.write(message + end)
+    def print(message, end='\n', flush=False):
+        text = message + end
+        Terminal.screen.extra_rows += Terminal.screen.rows_of(text)
+        sys.stdout.write(text)
         if flush:
             sys.stdout.flush()
     
+    @staticmethod
+    def write_frame(text):
+        """Écrire un écran complet: encodé en une fois et envoyé directement au tampon binaire"""
+        out = sys.stdout
+        buffer = getattr(out, 'buffer', None)
+        if buffer is None:
+            out.write(text)
+            out.flush()
+            return
+        out.flush()  # ne pas doubler un texte encore en attente dans la couche texte
+        buffer.write(text.encode(out.encoding or 'utf-8', out.errors or 'strict'))
+        buffer.flush()
+    
+    @staticmethod
+    def print_block(lines):
+        """Afficher plusieurs lignes en une seule écriture (un écran = un write + un flush)"""
+        Terminal.print('\n'.join(lines), flush=True)
+    
+    @staticmethod
+    def render(lines):
+        """Afficher un écran complet (mise à jour différentielle sur un terminal)"""
+        if sys.stdout.isatty():
+            Terminal.screen.render(lines)
+        else:
+            Terminal.print_block(lines)
+    
     @staticmethod
     def input(prompt):
         Terminal.print(prompt, end='', flush=True)
-        return sys.stdin.readline().strip()
+        line = sys.stdin.readline()
+        # Saisie écrite après l'invite (éventuellement repliée) puis retour chariot
+        Terminal.screen.extra_rows += Terminal.screen.rows_of(prompt.rsplit('\n', 1)[-1] + line.rstrip('\n') + '\n')
+        return line.strip()
+    
+    @staticmethod
+    def can_redraw():
+        """Vrai si le dernier écran peut être réaffiché par mise à jour différentielle"""
+        return sys.stdout.isatty() and bool(Terminal.screen.prev)
+    
+    @staticmethod
+    def redraw():
+        """Réafficher le dernier écran tel quel: seuls les messages écrits dessous sont effacés"""
+        if Terminal.can_redraw():
+            Terminal.screen.render(Terminal.screen.prev)
+    
+    @staticmethod
+    def drain_input():
+        """Ignorer les saisies en attente (touche maintenue, collage) avant le prochain écran"""
+        if sys.stdin.isatty():
+            termios.tcflush(sys.stdin, termios.TCIFLUSH)
     
     @staticmethod
     def clear():
-        os.system('clear')
+        sys.stdout.write("\x1b[H\x1b[2J")
         sys.stdout.flush()
+        Terminal.screen.invalidate()
     
     @staticmethod
     def getpass(prompt):
         """Saisie masquée pour les codes d'accès"""
+        sys.stdout.flush()
+        Terminal.screen.extra_rows += Terminal.screen.rows_of(prompt + '\n')
         return getpass.getpass(prompt)
 
 class Logger:
@@ -90,9 +216,52 @@ class Logger:
 # GESTIONNAIRE DE BASES DE DONNÉES - CRÉATION AUTOMATIQUE
 # =============================================================================
 
+# Colonnes TIMESTAMP <-> datetime (fromisoformat, sans passer par strptime)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
 class DatabaseManager:
     """Gestionnaire complet des bases de données avec création automatique"""
     
+    # Réglages appliqués à chaque ouverture (WAL, fsync allégé, cache mémoire)
+    JOURNAL_PRAGMAS = (
+        "journal_mode=WAL",
+        "synchronous=NORMAL",
+    )
+    CONNECTION_PRAGMAS = (
+        "temp_store=MEMORY",
+        "mmap_size=268435456",
+        "cache_size=-65536",
+    )
+    
+    # Connexion persistante vers la base principale (ouverte à la demande)
+    _conn = None
+    _conn_lock = threading.Lock()
+    
+    @staticmethod
+    def _connect(db_path, **kwargs):
+        """Ouvrir une connexion SQLite avec les PRAGMAs de performance"""
+        conn = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES, **kwargs)
+        for pragma in DatabaseManager.JOURNAL_PRAGMAS + DatabaseManager.CONNECTION_PRAGMAS:
+            conn.execute(f"PRAGMA {pragma}")
+        return conn
+    
+    @classmethod
+    def conn(cls):
+        """Connexion partagée vers la base principale, créée au premier appel"""
+        with cls._conn_lock:
+            if cls._conn is None:
+                cls._conn = cls._connect(Config.DB_PATH, check_same_thread=False)
+            return cls._conn
+    
+    @classmethod
+    def close_connection(cls):
+        """Fermer la connexion partagée (avant suppression de la base ou à la sortie)"""
+        with cls._conn_lock:
+            if cls._conn is not None:
+                cls._conn.close()
+                cls._conn = None
+    
     @staticmethod
     def ensure_all_databases():
         """Vérifier et créer toutes les bases de données si elles n'existent pas"""
@@ -106,30 +275,64 @@ class DatabaseManager:
             ("Configuration", DatabaseManager._ensure_config_database),
         ]
         
-        for db_name, db_function in databases:
-            if db_function():
-                Logger.success(f"{db_name} - OK")
-            else:
-                Logger.error(f"{db_name} - ÉCHEC")
+        # Une seule connexion (base principale) pour toutes les bases, les autres y sont attachées
+        try:
+            os.makedirs(os.path.dirname(Config.DB_PATH), exist_ok=True)
+            conn = DatabaseManager._connect(Config.DB_PATH)
+        except Exception as e:
+            Logger.error(f"Erreur ouverture base principale: {e}")
+            return False
+        
+        try:
+            for db_name, db_function in databases:
+                if db_function(conn):
+                    Logger.success(f"{db_name} - OK")
+                else:
+                    Logger.error(f"{db_name} - ÉCHEC")
+        finally:
+            conn.close()
         
         return True
     
     @staticmethod
-    def _ensure_main_database():
-        """Créer la base de données principale si elle n'existe pas"""
+    def _attach(conn, db_path, alias):
+        """Attacher une base secondaire à la connexion partagée et retourner un curseur"""
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (db_path,))
+        for pragma in DatabaseManager.JOURNAL_PRAGMAS:
+            conn.execute(f"PRAGMA {alias}.{pragma}")
+        return conn.cursor()
+    
+    # Objets attendus dans la base principale (tables et index)
+    MAIN_SCHEMA_OBJECTS = ('users', 'access_codes', 'system_status', 'ix_access_active_cover')
+    
+    @staticmethod
+    def _main_schema_ok(cursor):
+        """Vérifier que la base principale contient déjà toutes ses tables"""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")
+        existing = {row[0] for row in cursor.fetchall()}
+        return set(DatabaseManager.MAIN_SCHEMA_OBJECTS) <= existing
+    
+    @staticmethod
+    def _ensure_main_database(conn):
+        """Créer la base de données principale si elle n'existe pas (`conn` y est déjà ouverte)"""
         try:
-            db_path = Config.DB_PATH
-            db_dir = os.path.dirname(db_path)
+            cursor = conn.cursor()
+            
+            current_date = datetime.now()
+            month_year = f"{current_date.month:02d}-{current_date.year}"
             
-            # Créer le répertoire si nécessaire
-            if not os.path.exists(db_dir):
-                os.makedirs(db_dir, exist_ok=True)
-                Logger.info(f"Répertoire créé: {db_dir}")
+            # Base complète et code du mois déjà en place: aucune écriture nécessaire
+            if DatabaseManager._main_schema_ok(cursor):
+                cursor.execute('SELECT month_year FROM access_codes WHERE id = 1 AND is_active = 1')
+                row = cursor.fetchone()
+                if row and row[0] == month_year:
+                    Logger.debug("Base principale existe déjà")
+                    return True
             
             Logger.info("Création de la base de données principale...")
             
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
+            # Toute la création dans une seule transaction (un seul fsync)
+            cursor.execute('BEGIN')
             
             # Table des utilisateurs
             cursor.execute('''
@@ -154,6 +357,12 @@ class DatabaseManager:
                 )
             ''')
             
+            # Index couvrant pour la lecture du code actif (sans accès à la table)
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS ix_access_active_cover
+                ON access_codes (is_active, id, code, month_year, expires_at)
+            ''')
+            
             # Table du statut système
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS system_status (
@@ -167,19 +376,9 @@ class DatabaseManager:
             cursor.execute('INSERT OR IGNORE INTO system_status (id, asterisk_running) VALUES (1, 0)')
             
             # GÉNÉRATION AUTOMATIQUE DU CODE D'ACCÈS DÈS LA CRÉATION
-            current_date = datetime.now()
-            month_year = f"{current_date.month:02d}-{current_date.year}"
-            
             code_generator = DeterministicCodeGenerator()
             current_code = code_generator.get_current_code()
-            
-            if current_date.month == 12:
-                next_month = datetime(current_date.year + 1, 1, 1)
-            else:
-                next_month = datetime(current_date.year, current_date.month + 1, 1)
-            
-            expires_at = next_month - timedelta(days=1)
-            expires_at = expires_at.replace(hour=23, minute=59, second=59)
+            expires_at = _month_expiry(current_date.year, current_date.month)
             
             cursor.execute('''
                 INSERT OR REPLACE INTO access_codes (id, code, month_year, expires_at, is_active)
@@ -187,27 +386,25 @@ class DatabaseManager:
             ''', (current_code, month_year, expires_at))
             
             conn.commit()
-            conn.close()
             
-            # Permissions
-            os.chmod(db_path, 0o644)
             Logger.info("Base principale créée avec succès")
             Logger.info(f"🔐 Code d'accès généré automatiquement pour {month_year} et stocké en base")
             return True
             
         except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
             Logger.error(f"Erreur création base principale: {e}")
             return False
     
     @staticmethod
-    def _ensure_access_codes_database():
+    def _ensure_access_codes_database(conn):
         """Créer la base des codes d'accès si elle n'existe pas"""
         try:
-            db_path = "/home/vps/asterisk/access_codes.db"
+            db_path = Config.ACCESS_CODES_DB_PATH
             db_dir = os.path.dirname(db_path)
             
-            if not os.path.exists(db_dir):
-                os.makedirs(db_dir, exist_ok=True)
+            os.makedirs(db_dir, exist_ok=True)
             
             if os.path.exists(db_path):
                 Logger.debug("Base codes d'accès existe déjà")
@@ -215,11 +412,11 @@ class DatabaseManager:
             
             Logger.info("Création de la base des codes d'accès...")
             
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
+            cursor = DatabaseManager._attach(conn, db_path, "access_codes_db")
+            cursor.execute('BEGIN')
             
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS access_codes_history (
+                CREATE TABLE IF NOT EXISTS access_codes_db.access_codes_history (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     code TEXT NOT NULL,
                     month_year TEXT NOT NULL,
@@ -228,7 +425,7 @@ class DatabaseManager:
             ''')
             
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS access_attempts (
+                CREATE TABLE IF NOT EXISTS access_codes_db.access_attempts (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     code_attempt TEXT NOT NULL,
                     success INTEGER DEFAULT 0,
@@ -238,24 +435,23 @@ class DatabaseManager:
             ''')
             
             conn.commit()
-            conn.close()
-            os.chmod(db_path, 0o644)
             Logger.info("Base codes d'accès créée avec succès")
             return True
             
         except Exception as e:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
             Logger.error(f"Erreur création base codes accès: {e}")
             return False
     
     @staticmethod
-    def _ensure_system_logs_database():
+    def _ensure_system_logs_database(conn):
         """Créer la base des logs système si elle n'existe pas"""
         try:
-            db_path = "/home/vps/asterisk/system_logs.db"
+            db_path = Config.SYSTEM_LOGS_DB_PATH
             db_dir = os.path.dirname(db_path)
             
-            if not os.path.exists(db_dir):
-                os.makedirs(db_dir, exist_ok=True)
+            os.makedirs(db_dir, exist_ok=True)
             
             if os.path.exists(db_path):
                 Logger.debug("Base logs système existe déjà")
@@ -263,11 +459,11 @@ class DatabaseManager:
             
             Logger.info("Création de la base des logs système...")
             
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
+            cursor = DatabaseManager._attach(conn, db_path, "system_logs_db")
+            cursor.execute('BEGIN')
             
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS system_logs (
+                CREATE TABLE IF NOT EXISTS system_logs_db.system_logs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     level TEXT NOT NULL,
                     module TEXT NOT NULL,
@@ -277,7 +473,7 @@ class DatabaseManager:
             ''')
             
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS error_logs (
+                CREATE TABLE IF NOT EXISTS system_logs_db.error_logs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     error_type TEXT NOT NULL,
                     error_message TEXT NOT NULL,
@@ -287,24 +483,23 @@ class DatabaseManager:
             ''')
             
             conn.commit()
-            conn.close()
-            os.chmod(db_path, 0o644)
             Logger.info("Base logs système créée avec succès")
             return True
             
         except Exception as e:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
             Logger.error(f"Erreur création base logs système: {e}")
             return False
     
     @staticmethod
-    def _ensure_cdr_database():
+    def _ensure_cdr_database(conn):
         """Créer la base CDR si elle n'existe pas"""
         try:
-            db_path = "/home/vps/asterisk/cdr.db"
+            db_path = Config.CDR_DB_PATH
             db_dir = os.path.dirname(db_path)
             
-            if not os.path.exists(db_dir):
-                os.makedirs(db_dir, exist_ok=True)
+            os.makedirs(db_dir, exist_ok=True)
             
             if os.path.exists(db_path):
                 Logger.debug("Base CDR existe déjà")
@@ -312,11 +507,11 @@ class DatabaseManager:
             
             Logger.info("Création de la base CDR...")
             
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
+            cursor = DatabaseManager._attach(conn, db_path, "cdr_db")
+            cursor.execute('BEGIN')
             
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS cdr (
+                CREATE TABLE IF NOT EXISTS cdr_db.cdr (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     calldate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     src TEXT NOT NULL,
@@ -327,24 +522,23 @@ class DatabaseManager:
             ''')
             
             conn.commit()
-            conn.close()
-            os.chmod(db_path, 0o644)
             Logger.info("Base CDR créée avec succès")
             return True
             
         except Exception as e:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
             Logger.error(f"Erreur création base CDR: {e}")
             return False
     
     @staticmethod
-    def _ensure_config_database():
+    def _ensure_config_database(conn):
         """Créer la base de configuration si elle n'existe pas"""
         try:
-            db_path = "/home/vps/asterisk/config.db"
+            db_path = Config.CONFIG_DB_PATH
             db_dir = os.path.dirname(db_path)
             
-            if not os.path.exists(db_dir):
-                os.makedirs(db_dir, exist_ok=True)
+            os.makedirs(db_dir, exist_ok=True)
             
             if os.path.exists(db_path):
                 Logger.debug("Base configuration existe déjà")
@@ -352,11 +546,11 @@ class DatabaseManager:
             
             Logger.info("Création de la base de configuration...")
             
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
+            cursor = DatabaseManager._attach(conn, db_path, "config_db")
+            cursor.execute('BEGIN')
             
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS system_settings (
+                CREATE TABLE IF NOT EXISTS config_db.system_settings (
                     key TEXT PRIMARY KEY,
                     value TEXT NOT NULL,
                     description TEXT
@@ -370,19 +564,18 @@ class DatabaseManager:
                 ('log_retention_days', '30', 'Rétention des logs'),
             ]
             
-            for key, value, description in default_settings:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO system_settings (key, value, description)
-                    VALUES (?, ?, ?)
-                ''', (key, value, description))
+            cursor.executemany('''
+                INSERT OR IGNORE INTO config_db.system_settings (key, value, description)
+                VALUES (?, ?, ?)
+            ''', default_settings)
             
             conn.commit()
-            conn.close()
-            os.chmod(db_path, 0o644)
             Logger.info("Base configuration créée avec succès")
             return True
             
         except Exception as e:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
             Logger.error(f"Erreur création base configuration: {e}")
             return False
 
@@ -390,22 +583,18 @@ class DatabaseManager:
     def get_current_access_code():
         """Récupérer le code d'accès actuel depuis la base de données"""
         try:
-            conn = sqlite3.connect(Config.DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            cursor = DatabaseManager.conn().execute('''
                 SELECT code, month_year, expires_at FROM access_codes 
                 WHERE id = 1 AND is_active = 1
             ''')
             
             result = cursor.fetchone()
-            conn.close()
             
             if result:
                 return {
                     'code': result[0],
                     'month_year': result[1],
-                    'expires_at': datetime.strptime(result[2], '%Y-%m-%d %H:%M:%S') if isinstance(result[2], str) else result[2]
+                    'expires_at': result[2]
                 }
             return None
             
@@ -417,23 +606,20 @@ class DatabaseManager:
     def update_access_code(new_code, month_year, expires_at):
         """Mettre à jour le code d'accès dans la base de données"""
         try:
-            conn = sqlite3.connect(Config.DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE access_codes 
-                SET code = ?, month_year = ?, expires_at = ?, created_at = CURRENT_TIMESTAMP
-                WHERE id = 1
-            ''', (new_code, month_year, expires_at))
-            
-            conn.commit()
-            conn.close()
+            with DatabaseManager.conn() as conn:
+                conn.execute('''
+                    UPDATE access_codes 
+                    SET code = ?, month_year = ?, expires_at = ?, created_at = CURRENT_TIMESTAMP
+                    WHERE id = 1
+                ''', (new_code, month_year, expires_at))
             return True
             
         except Exception as e:
             Logger.error(f"Erreur mise à jour code accès: {e}")
             return False
 
+atexit.register(DatabaseManager.close_connection)
+
 # =============================================================================
 # INSTALLATEUR AUTOMATIQUE SYSTÈME
 # =============================================================================
@@ -441,32 +627,47 @@ class DatabaseManager:
 class SystemInstaller:
     """Installateur automatique avec création des bases de données"""
     
+    REQUIRED_PACKAGES = {
+        'asterisk': 'Asterisk PBX',
+        'sqlite3': 'Base de données SQLite',
+    }
+    
+    @staticmethod
+    def installed_packages(packages):
+        """Retourner l'ensemble des paquets installés parmi `packages` (un seul appel dpkg-query)"""
+        result = subprocess.run(
+            ['dpkg-query', '-W', '-f=${Package}\t${Status}\n', *packages],
+            capture_output=True,
+            text=True
+        )
+        installed = set()
+        for line in result.stdout.splitlines():
+            package, _, status = line.partition('\t')
+            if status.endswith('install ok installed'):
+                installed.add(package.split(':')[0])
+        return installed
+    
     @staticmethod
     def check_and_install_packages():
         """Vérifier et installer les paquets nécessaires"""
         Logger.info("Vérification des paquets système...")
         
-        required_packages = {
-            'asterisk': 'Asterisk PBX',
-            'sqlite3': 'Base de données SQLite',
-        }
+        required_packages = SystemInstaller.REQUIRED_PACKAGES
+        
+        try:
+            installed = SystemInstaller.installed_packages(required_packages)
+        except Exception as e:
+            Logger.error(f"Erreur vérification des paquets: {e}")
+            return False
         
         missing_packages = []
         
         for package, description in required_packages.items():
-            try:
-                result = subprocess.run(
-                    ['dpkg', '-l', package], 
-                    capture_output=True, 
-                    text=True
-                )
-                if result.returncode != 0:
-                    missing_packages.append((package, description))
-                    Logger.warning(f"{package} ({description}) - Manquant")
-                else:
-                    Logger.success(f"{package} ({description}) - Installé")
-            except Exception as e:
-                Logger.error(f"Erreur vérification {package}: {e}")
+            if package not in installed:
+                missing_packages.append((package, description))
+                Logger.warning(f"{package} ({description}) - Manquant")
+            else:
+                Logger.success(f"{package} ({description}) - Installé")
         
         if missing_packages:
             Logger.info(f"Installation de {len(missing_packages)} paquet(s) manquant(s)...")
@@ -509,20 +710,26 @@ class SystemInstaller:
         try:
             # Règles iptables pour Asterisk
             iptables_rules = [
-                ['iptables', '-A', 'INPUT', '-p', 'tcp', '--dport', '5060', '-j', 'ACCEPT'],
-                ['iptables', '-A', 'INPUT', '-p', 'udp', '--dport', '5060', '-j', 'ACCEPT'],
-                ['iptables', '-A', 'INPUT', '-p', 'tcp', '--dport', '5061', '-j', 'ACCEPT'],
-                ['iptables', '-A', 'INPUT', '-p', 'udp', '--dport', '5061', '-j', 'ACCEPT'],
-                ['iptables', '-A', 'INPUT', '-p', 'udp', '--dport', '10000:20000', '-j', 'ACCEPT'],
-                ['iptables', '-A', 'INPUT', '-p', 'tcp', '--dport', '5038', '-j', 'ACCEPT'],
+                '-A INPUT -p tcp --dport 5060 -j ACCEPT',
+                '-A INPUT -p udp --dport 5060 -j ACCEPT',
+                '-A INPUT -p tcp --dport 5061 -j ACCEPT',
+                '-A INPUT -p udp --dport 5061 -j ACCEPT',
+                '-A INPUT -p udp --dport 10000:20000 -j ACCEPT',
+                '-A INPUT -p tcp --dport 5038 -j ACCEPT',
             ]
             
+            # Chargement en un seul lot (sans vider les règles existantes)
+            rules_text = "*filter\n" + "\n".join(iptables_rules) + "\nCOMMIT\n"
+            
+            try:
+                subprocess.run(['iptables-restore', '-n'], input=rules_text,
+                               check=True, capture_output=True, text=True)
+            except subprocess.CalledProcessError as e:
+                Logger.warning(f"Impossible d'ajouter les règles: {e.stderr.strip()}")
+                return False
+            
             for rule in iptables_rules:
-                try:
-                    subprocess.run(rule, check=True, capture_output=True)
-                    Logger.success(f"Règle ajoutée: {' '.join(rule)}")
-                except subprocess.CalledProcessError:
-                    Logger.warning(f"Impossible d'ajouter la règle: {' '.join(rule)}")
+                Logger.success(f"Règle ajoutée: iptables {rule}")
             
             return True
             
@@ -573,14 +780,10 @@ maxfiles = 100000
             
             # Redémarrer et activer le service Asterisk
             subprocess.run(['systemctl', 'daemon-reload'], check=True, capture_output=True)
-            subprocess.run(['systemctl', 'enable', 'asterisk'], check=True, capture_output=True)
-            subprocess.run(['systemctl', 'start', 'asterisk'], check=True, capture_output=True)
+            subprocess.run(['systemctl', 'enable', '--now', 'asterisk'], check=True, capture_output=True)
             
-            time.sleep(3)
-            
-            # Vérifier le statut du service
-            result = subprocess.run(['systemctl', 'is-active', 'asterisk'], capture_output=True, text=True)
-            if result.returncode == 0:
+            # Vérifier le statut du service (état partagé avec AsteriskManager)
+            if AsteriskManager._wait_for_state(True):
                 Logger.success("Service Asterisk configuré et démarré avec succès")
                 return True
             else:
@@ -654,35 +857,18 @@ class SystemChecker:
     @staticmethod
     def _check_asterisk_package():
         try:
-            result = subprocess.run(['dpkg', '-l', 'asterisk'], capture_output=True, text=True)
-            return result.returncode == 0
+            return 'asterisk' in SystemInstaller.installed_packages(['asterisk'])
         except:
             return False
     
     @staticmethod
     def _check_databases():
         """Vérifier que les bases de données existent"""
-        databases = [
-            Config.DB_PATH,
-            "/home/vps/asterisk/access_codes.db",
-            "/home/vps/asterisk/system_logs.db",
-            "/home/vps/asterisk/cdr.db",
-            "/home/vps/asterisk/config.db"
-        ]
-        
-        for db_path in databases:
-            if not os.path.exists(db_path):
-                return False
-        return True
+        return all(os.path.exists(path) for _, path in DATABASES)
     
     @staticmethod
     def _check_asterisk_service():
-        try:
-            result = subprocess.run(['systemctl', 'is-active', 'asterisk'], 
-                                  capture_output=True, text=True)
-            return result.returncode == 0
-        except:
-            return False
+        return AsteriskManager.is_running()
 
 # =============================================================================
 # GESTIONNAIRE ASTERISK
@@ -691,28 +877,80 @@ class SystemChecker:
 class AsteriskManager:
     """Gestionnaire Asterisk avec service systemd"""
     
-    @staticmethod
-    def is_running():
+    # Durée de validité du dernier `systemctl is-active` (secondes)
+    STATUS_TTL = 0.5
+    # Intervalle du rafraîchissement en arrière-plan (secondes)
+    STATUS_POLL_INTERVAL = 1.0
+    _last_check = None
+    _poller = None
+    # Positionné tant que le menu principal (qui affiche le statut) est à l'écran
+    _polling = threading.Event()
+    
+    @classmethod
+    def is_running(cls, max_age=None):
+        if max_age is None:
+            # Statut tenu à jour par le thread de fond: pas de systemctl au rendu
+            max_age = cls.STATUS_POLL_INTERVAL * 2 if cls._polling.is_set() else cls.STATUS_TTL
+        now = time.monotonic()
+        last = cls._last_check
+        if last is not None and now - last[0] < max_age:
+            return last[1]
         try:
             result = subprocess.run(['systemctl', 'is-active', 'asterisk'], 
                                   capture_output=True, text=True, timeout=5)
-            return result.returncode == 0
+            running = result.returncode == 0
         except:
-            return False
+            running = False
+        # Ne pas écraser un résultat plus récent obtenu par un autre thread
+        last = cls._last_check
+        if last is None or last[0] <= now:
+            cls._last_check = (now, running)
+        return running
+    
+    @classmethod
+    def start_status_poller(cls, interval=STATUS_POLL_INTERVAL):
+        """Rafraîchir le statut dans un thread démon pendant que le menu principal est affiché"""
+        cls._polling.set()
+        if cls._poller is not None:
+            return
+        
+        def poll():
+            while True:
+                cls._polling.wait()
+                cls.is_running(max_age=0)
+                time.sleep(interval)
+        
+        cls._poller = threading.Thread(target=poll, name="asterisk-status", daemon=True)
+        cls._poller.start()
+    
+    @classmethod
+    def pause_status_poller(cls):
+        """Suspendre le rafraîchissement (sous-menus: statut non affiché)"""
+        cls._polling.clear()
+    
+    @staticmethod
+    def _wait_for_state(running, timeout=10.0):
+        """Attendre l'état voulu avec un intervalle croissant (50 ms -> 1 s)"""
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        while True:
+            if AsteriskManager.is_running(max_age=0) == running:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
     
     @staticmethod
     def start():
         Logger.info("Démarrage du service Asterisk...")
         try:
-            result = subprocess.run(['service', 'asterisk', 'start'], 
+            result = subprocess.run(['systemctl', 'start', 'asterisk'], 
                                   capture_output=True, text=True, timeout=30)
             
             if result.returncode == 0:
-                for i in range(10):
-                    time.sleep(1)
-                    if AsteriskManager.is_running():
-                        Logger.success("Service Asterisk démarré avec succès")
-                        return True
+                if AsteriskManager._wait_for_state(True):
+                    Logger.success("Service Asterisk démarré avec succès")
                 return True
             else:
                 Logger.error(f"Échec du démarrage: {result.stderr}")
@@ -726,15 +964,12 @@ class AsteriskManager:
     def stop():
         Logger.info("Arrêt du service Asterisk...")
         try:
-            result = subprocess.run(['service', 'asterisk', 'stop'], 
+            result = subprocess.run(['systemctl', 'stop', 'asterisk'], 
                                   capture_output=True, text=True, timeout=30)
             
             if result.returncode == 0:
-                for i in range(10):
-                    time.sleep(1)
-                    if not AsteriskManager.is_running():
-                        Logger.success("Service Asterisk arrêté avec succès")
-                        return True
+                if AsteriskManager._wait_for_state(False):
+                    Logger.success("Service Asterisk arrêté avec succès")
                 return True
             else:
                 Logger.error(f"Échec de l'arrêt: {result.stderr}")
@@ -748,15 +983,12 @@ class AsteriskManager:
     def restart():
         Logger.info("Redémarrage du service Asterisk...")
         try:
-            result = subprocess.run(['service', 'asterisk', 'restart'], 
+            result = subprocess.run(['systemctl', 'restart', 'asterisk'], 
                                   capture_output=True, text=True, timeout=30)
             
             if result.returncode == 0:
-                for i in range(10):
-                    time.sleep(1)
-                    if AsteriskManager.is_running():
-                        Logger.success("Service Asterisk redémarré avec succès")
-                        return True
+                if AsteriskManager._wait_for_state(True):
+                    Logger.success("Service Asterisk redémarré avec succès")
                 return True
             else:
                 Logger.error(f"Échec du redémarrage: {result.stderr}")
@@ -788,44 +1020,108 @@ class AsteriskManager:
 # ALGORITHME DÉTERMINISTE COMMUN
 # =============================================================================
 
+# Longueur et alphabet des codes d'accès générés
+CODE_LENGTH = 8
+MAX_CODE_LENGTH = 32  # taille d'un condensat SHA-256
+CODE_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+# Table octet -> caractère pour chaque position du condensat SHA-256 (décalage +i intégré)
+_POSITION_TABLES = tuple(
+    bytes(CODE_ALPHABET[(byte_val + i) % len(CODE_ALPHABET)] for byte_val in range(256))
+    for i in range(MAX_CODE_LENGTH)
+)
+
+# Noms des mois indexés par numéro (1-12)
+MONTH_NAMES = (
+    "", "Janvier", "Février", "Mars", "Avril",
+    "Mai", "Juin", "Juillet", "Août",
+    "Septembre", "Octobre", "Novembre", "Décembre",
+)
+
+@functools.lru_cache(maxsize=16)
+def period_display(month_year):
+    """Nom du mois et année d'une période 'MM-YYYY', mis en cache par période"""
+    month_str, year = month_year.split('-', 1)
+    month_num = int(month_str)
+    month_name = MONTH_NAMES[month_num] if 1 <= month_num <= 12 else "Inconnu"
+    return month_name, year
+
+# Nombre de jours par mois (février hors année bissextile)
+_LAST_DAY = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+@functools.lru_cache(maxsize=32)
+def _month_expiry(year, month):
+    """Dernière seconde du mois (fin de validité du code mensuel), mise en cache par mois"""
+    day = 29 if month == 2 and calendar.isleap(year) else _LAST_DAY[month]
+    return datetime(year, month, day, 23, 59, 59)
+
+# Dernière période calculée et instant (epoch) du début du mois suivant
+_period_cache = (0.0, "")
+
+def _next_month_epoch(current_date):
+    """Instant (epoch) du premier jour du mois suivant `current_date`"""
+    return datetime(current_date.year + current_date.month // 12, current_date.month % 12 + 1, 1).timestamp()
+
 class DeterministicCodeGenerator:
     """Générateur déterministe de codes"""
     
+    month_names = MONTH_NAMES
+    
     def __init__(self, secret_seed=Config.SECRET_SEED):
         self.secret_seed = secret_seed
-        self.month_names = {
-            1: "Janvier", 2: "Février", 3: "Mars", 4: "Avril",
-            5: "Mai", 6: "Juin", 7: "Juillet", 8: "Août", 
-            9: "Septembre", 10: "Octobre", 11: "Novembre", 12: "Décembre"
-        }
+        # États SHA-256 internes/externes du HMAC dérivés une fois de la clé (RFC 2104):
+        # la graine n'est encodée qu'ici
+        key = secret_seed.encode('utf-8')
+        if len(key) > 64:
+            key = hashlib.sha256(key).digest()
+        key = key.ljust(64, b'\x00')
+        self._inner_state = hashlib.sha256(bytes(b ^ 0x36 for b in key))
+        self._outer_state = hashlib.sha256(bytes(b ^ 0x5C for b in key))
+        # Codes déjà calculés, par (période, longueur) - la clé est propre à l'instance
+        self._cached_code = functools.lru_cache(maxsize=32)(self._compute_code)
+        # Dernier couple (période, code) renvoyé par get_current_code
+        self._cached = (None, None)
     
     def get_current_period(self):
+        """Période courante MM-AAAA (recalculée seulement au changement de mois)"""
+        global _period_cache
+        valid_until, month_year = _period_cache
+        if time.time() < valid_until:
+            return month_year
+        
         current_date = datetime.now()
-        return f"{current_date.month:02d}-{current_date.year}"
+        month_year = f"{current_date.month:02d}-{current_date.year}"
+        _period_cache = (_next_month_epoch(current_date), month_year)
+        return month_year
     
-    def generate_deterministic_code(self, month_year=None, length=8):
+    def generate_deterministic_code(self, month_year=None, length=CODE_LENGTH):
         if month_year is None:
             month_year = self.get_current_period()
-        
-        hmac_obj = hmac.new(
-            self.secret_seed.encode('utf-8'),
-            month_year.encode('utf-8'),
-            hashlib.sha256
-        )
-        
-        hash_bytes = hmac_obj.digest()
-        chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
-        code_chars = []
-        
-        for i in range(length):
-            byte_val = hash_bytes[i % len(hash_bytes)] + i
-            code_chars.append(chars[byte_val % len(chars)])
-        
-        return ''.join(code_chars)
+        if length > MAX_CODE_LENGTH:
+            raise ValueError(f"Longueur de code maximale: {MAX_CODE_LENGTH}")
+        return self._cached_code(month_year, length)
+    
+    def _compute_code(self, month_year, length):
+        # HMAC-SHA256 à partir des états pré-calculés: plus rapide que hmac.digest(),
+        # qui redérive les blocs ipad/opad de la clé à chaque appel
+        inner = self._inner_state.copy()
+        inner.update(month_year.encode('utf-8'))
+        outer = self._outer_state.copy()
+        outer.update(inner.digest())
+        
+        hash_bytes = outer.digest()
+        return bytes(
+            table[byte_val] for table, byte_val in zip(_POSITION_TABLES, hash_bytes[:length])
+        ).decode('ascii')
     
     def get_current_code(self):
         month_year = self.get_current_period()
-        return self.generate_deterministic_code(month_year)
+        cached_period, cached_code = self._cached
+        if month_year == cached_period:
+            return cached_code
+        code = self.generate_deterministic_code(month_year)
+        self._cached = (month_year, code)
+        return code
 
 # =============================================================================
 # GESTIONNAIRE DE CODES MASQUÉS
@@ -838,53 +1134,47 @@ class HiddenAccessCodeManager(DeterministicCodeGenerator):
     
     def get_current_code_with_expiry(self):
         current_date = datetime.now()
-        month_year = self.get_current_period()
         code = self.get_current_code()
-        
-        if current_date.month == 12:
-            next_month = datetime(current_date.year + 1, 1, 1)
-        else:
-            next_month = datetime(current_date.year, current_date.month + 1, 1)
-        
-        expires_at = next_month - timedelta(days=1)
-        expires_at = expires_at.replace(hour=23, minute=59, second=59)
+        expires_at = _month_expiry(current_date.year, current_date.month)
         
         return code, expires_at
     
-    def display_code_status(self):
-        """Afficher le statut du code sans révéler le code"""
-        current_date = datetime.now()
-        code_data = DatabaseManager.get_current_access_code()
-        
+    def code_status_lines(self, code_data):
+        """Lignes de statut du code, sans révéler le code"""
         if not code_data:
-            Terminal.print("❌ Aucun code d'accès trouvé")
-            return None, None
+            return ["❌ Aucun code d'accès trouvé"]
         
-        code = code_data['code']
         expires_at = code_data['expires_at']
         month_year = code_data['month_year']
         
-        days_remaining = (expires_at - current_date).days
-        month_num = int(month_year.split('-')[0])
-        month_name = self.month_names.get(month_num, "Inconnu")
-        year = month_year.split('-')[1]
-        
-        Terminal.print(f"🔐 Code d'accès {month_name} {year}: *** MASQUÉ ***")
-        Terminal.print(f"   Expire le: {expires_at.strftime('%d/%m/%Y')}")
-        Terminal.print(f"   Jours restants: {days_remaining}")
+        days_remaining = (expires_at - datetime.now()).days
+        month_name, year = period_display(month_year)
         
-        return code, expires_at
+        return [
+            f"🔐 Code d'accès {month_name} {year}: *** MASQUÉ ***",
+            f"   Expire le: {expires_at.strftime('%d/%m/%Y')}",
+            f"   Jours restants: {days_remaining}",
+        ]
     
-    def validate_code(self, input_code):
-        expected_code_data = DatabaseManager.get_current_access_code()
-        if not expected_code_data:
-            return False
+    def validate_code(self, input_code, expected_code=None):
+        """Comparer la saisie au code attendu (lu en base si non fourni)"""
+        if expected_code is None:
+            # Longueur incorrecte: rejet immédiat, sans lecture en base
+            if len(input_code) != CODE_LENGTH:
+                return False
+            expected_code_data = DatabaseManager.get_current_access_code()
+            if not expected_code_data:
+                return False
+            expected_code = expected_code_data['code']
         
-        expected_code = expected_code_data['code']
-        return input_code == expected_code
+        if len(input_code) != len(expected_code):
+            return False
+        # Comparaison en temps constant
+        return hmac.compare_digest(input_code.encode('utf-8'), expected_code.encode('utf-8'))
     
-    def is_code_expired(self):
-        code_data = DatabaseManager.get_current_access_code()
+    def is_code_expired(self, code_data=None):
+        if code_data is None:
+            code_data = DatabaseManager.get_current_access_code()
         if not code_data:
             return True
         
@@ -912,11 +1202,14 @@ class AccessValidator:
         Terminal.print("╚══════════════════════════════════════════════════════════════╝")
         Terminal.print("")
         
+        # Une seule lecture du code pour toute la session de validation
+        code_data = DatabaseManager.get_current_access_code()
+        
         # Vérifier si le code a expiré
-        if self.code_manager.is_code_expired():
+        if code_data is None or self.code_manager.is_code_expired(code_data):
             return self._handle_expired_code()
         else:
-            return self._validate_current_code()
+            return self._validate_current_code(code_data)
     
     def _handle_expired_code(self):
         """Gérer le cas où le code a expiré"""
@@ -928,45 +1221,29 @@ class AccessValidator:
         self.asterisk_manager.stop()
         
         # Générer et stocker le nouveau code
-        current_date = datetime.now()
+        new_code, expires_at = self.code_manager.get_current_code_with_expiry()
         month_year = self.code_manager.get_current_period()
-        new_code = self.code_manager.get_current_code()
-        
-        if current_date.month == 12:
-            next_month = datetime(current_date.year + 1, 1, 1)
-        else:
-            next_month = datetime(current_date.year, current_date.month + 1, 1)
-        
-        expires_at = next_month - timedelta(days=1)
-        expires_at = expires_at.replace(hour=23, minute=59, second=59)
         
         # Mettre à jour la base de données
         DatabaseManager.update_access_code(new_code, month_year, expires_at)
         
-        month_name = self.code_manager.month_names[current_date.month]
-        Terminal.print(f"📅 Nouveau code généré pour {month_name} {current_date.year}")
+        # L'expiration tombe dans le mois du code: elle donne mois et année affichés
+        month_name = self.code_manager.month_names[expires_at.month]
+        Terminal.print(f"📅 Nouveau code généré pour {month_name} {expires_at.year}")
         Terminal.print("🔐 Veuillez saisir le nouveau code d'accès:")
         
-        return self._prompt_for_code(unlimited_attempts=True)
+        return self._prompt_for_code(new_code, unlimited_attempts=True)
     
-    def _validate_current_code(self):
+    def _validate_current_code(self, code_data):
         """Valider le code actuel"""
-        code_data = DatabaseManager.get_current_access_code()
-        if not code_data:
-            Terminal.print("❌ Erreur: Aucun code d'accès trouvé")
-            return False
-        
-        month_year = code_data['month_year']
-        month_num = int(month_year.split('-')[0])
-        month_name = self.code_manager.month_names.get(month_num, "Inconnu")
-        year = month_year.split('-')[1]
+        month_name, year = period_display(code_data['month_year'])
         
         Terminal.print(f"📅 Période: {month_name} {year}")
         Terminal.print("🔐 Veuillez saisir le code d'accès pour continuer:")
         
-        return self._prompt_for_code(unlimited_attempts=False)
+        return self._prompt_for_code(code_data['code'], unlimited_attempts=False)
     
-    def _prompt_for_code(self, unlimited_attempts=False):
+    def _prompt_for_code(self, expected_code, unlimited_attempts=False):
         """Demander le code à l'utilisateur"""
         attempts = 0
         max_attempts = 9999 if unlimited_attempts else self.max_attempts
@@ -976,7 +1253,7 @@ class AccessValidator:
                 entered_code = Terminal.getpass("Code d'accès: ").strip().upper()
                 attempts += 1
                 
-                if self.code_manager.validate_code(entered_code):
+                if self.code_manager.validate_code(entered_code, expected_code):
                     Terminal.print("✅ Code correct! Accès autorisé...")
                     
                     if unlimited_attempts:
@@ -986,7 +1263,8 @@ class AccessValidator:
                         else:
                             Terminal.print("❌ Erreur lors du redémarrage d'Asterisk")
                     
-                    time.sleep(1)
+                    if Config.LOGIN_SUCCESS_DELAY:
+                        time.sleep(Config.LOGIN_SUCCESS_DELAY)
                     return True
                 else:
                     remaining_attempts = max_attempts - attempts
@@ -1008,23 +1286,40 @@ class AccessValidator:
 
 class UserManager:
     
+    # Version de la table users (incrémentée à chaque écriture) et dernière liste lue,
+    # partagées par toutes les instances
+    _version = 0
+    _users_cache = (None, -1, [])
+    
     def __init__(self):
-        # S'assurer que la base existe
-        DatabaseManager._ensure_main_database()
+        # S'assurer que la base existe (via la connexion partagée)
+        DatabaseManager._ensure_main_database(DatabaseManager.conn())
+    
+    def _taken_numbers(self):
+        """Numéros déjà attribués, chargés en une seule requête"""
+        # Intervalle [préfixe, préfixe suivant) : parcours de l'index UNIQUE sur numero
+        prefix = Config.EXTENSION_PREFIX
+        prefix_end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        cursor = DatabaseManager.conn().execute(
+            "SELECT numero FROM users WHERE numero >= ? AND numero < ?", (prefix, prefix_end)
+        )
+        return {row[0] for row in cursor.fetchall()}
+    
+    def _draw_phone_number(self, taken):
+        """Tirer un numéro absent de `taken` (None si tous sont attribués)"""
+        if len(taken) >= 10 ** 6:
+            Logger.error("Plus aucun numéro disponible")
+            return None
+        
+        while True:
+            phone_number = f"{Config.EXTENSION_PREFIX}{random.randrange(10 ** 6):06d}"
+            
+            if phone_number not in taken:
+                return phone_number
     
     def generate_phone_number(self):
         try:
-            conn = sqlite3.connect(Config.DB_PATH)
-            cursor = conn.cursor()
-            
-            while True:
-                random_digits = ''.join(random.choice(string.digits) for _ in range(6))
-                phone_number = f"{Config.EXTENSION_PREFIX}{random_digits}"
-                
-                cursor.execute("SELECT id FROM users WHERE numero = ?", (phone_number,))
-                if not cursor.fetchone():
-                    conn.close()
-                    return phone_number
+            return self._draw_phone_number(self._taken_numbers())
                     
         except Exception as e:
             Logger.error(f"Erreur génération numéro: {e}")
@@ -1036,16 +1331,12 @@ class UserManager:
             if not phone_number:
                 return False
             
-            conn = sqlite3.connect(Config.DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "INSERT INTO users (numero, password, context) VALUES (?, ?, ?)",
-                (phone_number, password, context)
-            )
-            
-            conn.commit()
-            conn.close()
+            with DatabaseManager.conn() as conn:
+                conn.execute(
+                    "INSERT INTO users (numero, password, context) VALUES (?, ?, ?)",
+                    (phone_number, password, context)
+                )
+            UserManager._version += 1
             
             Logger.success(f"Utilisateur ajouté: {phone_number}")
             return phone_number
@@ -1054,29 +1345,69 @@ class UserManager:
             Logger.error(f"Erreur ajout utilisateur: {e}")
             return False
     
-    def list_users(self):
+    def add_users_bulk(self, users):
+        """Ajouter plusieurs utilisateurs [(mot de passe, contexte), ...] en une seule transaction
+        
+        Retourne la liste des numéros attribués, dans l'ordre de `users` (liste vide si
+        `users` est vide), ou False en cas d'erreur: tester le résultat avec `is False`.
+        """
+        users = list(users)
+        if not users:
+            return []
+        
         try:
-            conn = sqlite3.connect(Config.DB_PATH)
-            cursor = conn.cursor()
+            taken = self._taken_numbers()
+            rows = []
+            
+            for password, context in users:
+                phone_number = self._draw_phone_number(taken)
+                if not phone_number:
+                    return False
+                taken.add(phone_number)
+                rows.append((phone_number, password, context))
+            
+            with DatabaseManager.conn() as conn:
+                conn.executemany(
+                    "INSERT INTO users (numero, password, context) VALUES (?, ?, ?)",
+                    rows
+                )
+            UserManager._version += 1
             
-            cursor.execute("SELECT numero, context, created_at FROM users ORDER BY created_at DESC")
-            users = cursor.fetchall()
+            Logger.success(f"{len(rows)} utilisateur(s) ajouté(s)")
+            return [row[0] for row in rows]
             
-            conn.close()
+        except Exception as e:
+            Logger.error(f"Erreur ajout utilisateurs: {e}")
+            return False
+    
+    def list_users(self):
+        try:
+            # Liste en cache tant que ni la table ni la connexion (base supprimée) n'ont changé
+            conn = DatabaseManager.conn()
+            cached_conn, cached_version, users = UserManager._users_cache
+            if cached_conn is conn and cached_version == UserManager._version:
+                return users
+            
+            cursor = conn.execute(
+                "SELECT numero, context, created_at FROM users ORDER BY created_at DESC"
+            )
+            users = cursor.fetchall()
+            UserManager._users_cache = (conn, UserManager._version, users)
             return users
             
         except Exception as e:
             Logger.error(f"Erreur liste utilisateurs: {e}")
             return []
     
+    def count_users(self):
+        """Nombre d'utilisateurs, sans requête tant que la liste en cache est à jour"""
+        return len(self.list_users())
+    
     def delete_user(self, phone_number):
         try:
-            conn = sqlite3.connect(Config.DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM users WHERE numero = ?", (phone_number,))
-            conn.commit()
-            conn.close()
+            with DatabaseManager.conn() as conn:
+                conn.execute("DELETE FROM users WHERE numero = ?", (phone_number,))
+            UserManager._version += 1
             
             Logger.success(f"Utilisateur {phone_number} supprimé")
             return True
@@ -1089,31 +1420,8 @@ class UserManager:
 # CONFIGURATEUR ASTERISK
 # =============================================================================
 
-class AsteriskConfigurator:
-    
-    def __init__(self):
-        self.user_manager = UserManager()
-    
-    def configure_asterisk(self):
-        Logger.info("Configuration d'Asterisk en cours...")
-        
-        try:
-            os.makedirs(Config.ASTERISK_CONFIG_DIR, exist_ok=True)
-            
-            self._create_pjsip_config()
-            self._create_extensions_config()
-            
-            AsteriskManager.reload()
-            
-            Logger.success("Configuration Asterisk terminée")
-            return True
-            
-        except Exception as e:
-            Logger.error(f"Erreur configuration Asterisk: {e}")
-            return False
-    
-    def _create_pjsip_config(self):
-        pjsip_conf = """
+# Modèles de configuration ({n} = numéro de l'utilisateur)
+PJSIP_HEADER = """
 [transport-udp]
 type=transport
 protocol=udp
@@ -1147,42 +1455,35 @@ max_contacts=1
 remove_existing=yes
 
 """
-        
-        users = self.user_manager.list_users()
-        for user in users:
-            phone_number, context, _ = user
-            pjsip_conf += f"""
-; Configuration pour {phone_number}
-[{phone_number}]
+
+PJSIP_USER_TEMPLATE = """
+; Configuration pour {n}
+[{n}]
 type=endpoint
 context=from-internal
 disallow=all
 allow=ulaw,alaw,g722
-auth={phone_number}
-aors={phone_number}
+auth={n}
+aors={n}
 transport=transport-udp
 force_rport=yes
 rewrite_contact=yes
 direct_media=no
 
-[{phone_number}]
+[{n}]
 type=auth
 auth_type=userpass
-password={phone_number}
-username={phone_number}
+password={n}
+username={n}
 
-[{phone_number}]
+[{n}]
 type=aor
 max_contacts=1
 remove_existing=yes
 
 """
-        
-        with open(os.path.join(Config.ASTERISK_CONFIG_DIR, "pjsip.conf"), "w") as f:
-            f.write(pjsip_conf)
-    
-    def _create_extensions_config(self):
-        extensions_conf = """
+
+EXTENSIONS_HEADER = """
 [general]
 static=yes
 writeprotect=no
@@ -1199,19 +1500,159 @@ same => n,Hangup()
 
 ; Utilisateurs générés automatiquement
 """
+
+EXTENSION_USER_TEMPLATE = "exten => {n},1,Dial(PJSIP/{n})\n"
+
+class AsteriskConfigurator:
+    
+    def __init__(self):
+        self.user_manager = UserManager()
+    
+    def configure_asterisk(self):
+        Logger.info("Configuration d'Asterisk en cours...")
         
-        users = self.user_manager.list_users()
-        for user in users:
-            phone_number, context, _ = user
-            extensions_conf += f"exten => {phone_number},1,Dial(PJSIP/{phone_number})\n"
+        try:
+            os.makedirs(Config.ASTERISK_CONFIG_DIR, exist_ok=True)
+            
+            # Une seule lecture des utilisateurs pour les deux fichiers
+            self._write_configs(self.user_manager.list_users())
+            
+            AsteriskManager.reload()
+            
+            Logger.success("Configuration Asterisk terminée")
+            return True
+            
+        except Exception as e:
+            Logger.error(f"Erreur configuration Asterisk: {e}")
+            return False
+    
+    def _write_configs(self, users):
+        """Générer pjsip.conf et extensions.conf en un seul passage sur les utilisateurs"""
+        pjsip_parts = [PJSIP_HEADER]
+        extensions_parts = [EXTENSIONS_HEADER]
+        for phone_number, _, _ in users:
+            pjsip_parts.append(PJSIP_USER_TEMPLATE.format(n=phone_number))
+            extensions_parts.append(EXTENSION_USER_TEMPLATE.format(n=phone_number))
         
+        with open(os.path.join(Config.ASTERISK_CONFIG_DIR, "pjsip.conf"), "w") as f:
+            f.write(''.join(pjsip_parts))
         with open(os.path.join(Config.ASTERISK_CONFIG_DIR, "extensions.conf"), "w") as f:
-            f.write(extensions_conf)
+            f.write(''.join(extensions_parts))
 
 # =============================================================================
 # INTERFACE UTILISATEUR COMPLÈTE
 # =============================================================================
 
+# Parties fixes des écrans, construites une seule fois (seul l'état est formaté à chaque rendu)
+HEADER_LINES = (
+    "╔══════════════════════════════════════════════════════════════╗",
+    "║              ASTERISK MANAGER - SERVICE SYSTEMD             ║",
+    "║          Système de validation par code d'accès             ║",
+    "╚══════════════════════════════════════════════════════════════╝",
+    "",
+)
+
+MAIN_MENU_OPTIONS = (
+    "\nMENU PRINCIPAL:",
+    "1. 🔧 Configuration Asterisk Automatique",
+    "2. 👥 Gestion des utilisateurs",
+    "3. 📞 Gestion des numéros 601",
+    "4. 🚀 Contrôle Asterisk (Start/Stop/Restart)",
+    "5. 🔐 Gestion des codes d'accès",
+    "6. 🔍 Vérification système",
+    "7. ⚙️  Installation/Réparation système",
+    "8. 🗄️  Gestion des bases de données",
+    "9. 🔄 Revalider le code d'accès",
+    "0. 🚪 Quitter",
+)
+
+CONFIGURATION_SCREEN = (
+    "🔧 CONFIGURATION ASTERISK AUTOMATIQUE",
+    "",
+    "Cette configuration va:",
+    "✅ Créer les fichiers de configuration Asterisk",
+    "✅ Configurer les utilisateurs existants",
+    "✅ Recharger la configuration Asterisk",
+    "",
+)
+
+USERS_MENU_OPTIONS = (
+    "\n1. ➕ Ajouter un utilisateur",
+    "2. 🗑️  Supprimer un utilisateur",
+    "3. 🔄 Reconfigurer Asterisk",
+    "0. ↩️  Retour",
+)
+
+NUMBERS_FORMAT_LINES = (
+    f"\nFormat: {Config.EXTENSION_PREFIX}XXXXXX (9 chiffres)",
+    "Génération automatique à chaque nouvel utilisateur",
+)
+
+ASTERISK_CONTROL_OPTIONS = (
+    "\n1. ▶️  Démarrer Asterisk (service start)",
+    "2. ⏹️  Arrêter Asterisk (service stop)",
+    "3. 🔄 Redémarrer Asterisk (service restart)",
+    "4. 🔃 Recharger configuration (service reload)",
+    "5. 📊 Statut détaillé",
+    "0. ↩️  Retour",
+)
+
+ACCESS_CODES_OPTIONS = (
+    "\n1. 🔄 Régénérer le code",
+    "2. ✅ Valider un code",
+    "3. 🔍 Afficher le code actuel (DEBUG)",
+    "0. ↩️  Retour",
+)
+
+SYSTEM_INSTALL_SCREEN = (
+    "⚙️  INSTALLATION ET RÉPARATION SYSTÈME",
+    "",
+    "Options disponibles:",
+    "1. 🔍 Vérifier l'état du système",
+    "2. 📦 Installer les paquets manquants",
+    "3. 🔥 Configurer le firewall (alternative)",
+    "4. 📞 Configurer le service Asterisk",
+    "5. 🚀 Installation complète automatique",
+    "0. ↩️  Retour",
+)
+
+DATABASE_MENU_OPTIONS = (
+    "\n🔧 OPTIONS:",
+    "1. 🔄 Recréer toutes les bases",
+    "2. 🗑️  Supprimer une base",
+    "0. ↩️  Retour",
+)
+
+RECREATE_DATABASES_SCREEN = (
+    "🔄 RECRÉATION DE TOUTES LES BASES",
+    "",
+    "Cette action va:",
+    "✅ Recréer toutes les bases de données",
+    "✅ Conserver la structure et les données",
+    "✅ Régénérer les codes d'accès",
+    "",
+)
+
+# Écran de vérification système, rempli en un seul format_map
+SYSTEM_CHECK_TEMPLATE = (
+    "🔍 VÉRIFICATION SYSTÈME\n"
+    "\n"
+    "Asterisk: {asterisk}\n"
+    "Code d'accès: {code}\n"
+    "Utilisateurs: {users} configuré(s)\n"
+    "Base de données: {database}\n"
+    "\n"
+    "Statut global: {overall}"
+)
+
+# Parties du menu principal à recalculer au retour d'un sous-menu
+USERS_DIRTY = 1
+CODE_DIRTY = 2
+ALL_DIRTY = USERS_DIRTY | CODE_DIRTY
+
+# Réponses acceptées aux confirmations (o/N)
+YES_ANSWERS = frozenset({'o', 'oui', 'y', 'yes'})
+
 class CompleteMenuManager:
     
     def __init__(self):
@@ -1220,14 +1661,61 @@ class CompleteMenuManager:
         self.asterisk_manager = AsteriskManager()
         self.configurator = AsteriskConfigurator()
         self.access_validator = AccessValidator()
+        
+        # Données du menu principal par partie (ligne du code d'accès, nombre
+        # d'utilisateurs), réutilisées tant que le sous-menu quitté ne signale pas de modification
+        self._main_sections = {}
+        
+        # Incrémenté après chaque action exécutée: un écran de sous-menu n'est recalculé
+        # que si une action a pu le modifier (un choix invalide ne change rien)
+        self.render_epoch = 0
+        
+        # Tables de dispatch des menus, construites une seule fois
+        # (les choix à sémantique particulière, comme "0", restent traités à part).
+        # Les handlers du menu principal renvoient les parties modifiées (None = tout)
+        self._main_dispatch = {
+            "1": self.configuration_menu,
+            "2": self.users_menu,
+            "3": self.numbers_menu,
+            "4": self.asterisk_control_menu,
+            "5": self.access_codes_menu,
+            "6": self.system_check_menu,
+            "7": self.system_install_menu,
+            "8": self.database_management_menu,
+            "9": self.revalidate_access,
+        }
+        self._users_dispatch = {
+            "1": self.add_user_menu,
+            "2": self.delete_user_menu,
+            "3": self.reconfigure_users,
+        }
+        self._asterisk_dispatch = {
+            "1": self.asterisk_manager.start,
+            "2": self.asterisk_manager.stop,
+            "3": self.asterisk_manager.restart,
+            "4": self.asterisk_manager.reload,
+            "5": self.show_asterisk_status,
+        }
+        self._access_codes_dispatch = {
+            "1": self.regenerate_code,
+            "2": self.validate_code_menu,
+            "3": self.show_current_code_debug,
+        }
+        self._install_dispatch = {
+            "1": SystemChecker.check_system_requirements,
+            "2": SystemInstaller.check_and_install_packages,
+            "3": SystemInstaller.configure_firewall_alternative,
+            "4": SystemInstaller.setup_asterisk,
+            "5": SystemInstaller.full_system_install,
+        }
+        self._database_dispatch = {
+            "1": self.recreate_all_databases,
+            "2": self.delete_database_menu,
+        }
     
-    def show_header(self):
-        Terminal.clear()
-        Terminal.print("╔══════════════════════════════════════════════════════════════╗")
-        Terminal.print("║              ASTERISK MANAGER - SERVICE SYSTEMD             ║")
-        Terminal.print("║          Système de validation par code d'accès             ║")
-        Terminal.print("╚══════════════════════════════════════════════════════════════╝")
-        Terminal.print("")
+    def show_header(self, lines=()):
+        """Afficher l'en-tête et le contenu de l'écran en une seule écriture"""
+        Terminal.render([*HEADER_LINES, *lines])
     
     def main_menu(self):
         # VALIDATION OBLIGATOIRE DU CODE D'ACCÈS AVANT LE MENU
@@ -1235,74 +1723,70 @@ class CompleteMenuManager:
             Terminal.print("❌ Accès refusé. Le système reste bloqué.")
             sys.exit(1)
         
-        # Menu principal après validation réussie
+        # Statut Asterisk rafraîchi en arrière-plan tant que le menu principal est affiché
+        AsteriskManager.start_status_poller()
+        
+        # Menu principal après validation réussie: premier affichage, puis
+        # traitement de chaque choix avant de redessiner l'écran
+        self.draw_main_menu()
         while True:
-            self.show_header()
-            
-            status = "✅ EN COURS" if self.asterisk_manager.is_running() else "❌ ARRÊTÉ"
-            Terminal.print(f"Statut Asterisk: {status}")
-            
-            self.code_manager.display_code_status()
-            
-            users = self.user_manager.list_users()
-            Terminal.print(f"Utilisateurs configurés: {len(users)}")
-            
-            Terminal.print(f"\nMENU PRINCIPAL:")
-            Terminal.print("1. 🔧 Configuration Asterisk Automatique")
-            Terminal.print("2. 👥 Gestion des utilisateurs")
-            Terminal.print("3. 📞 Gestion des numéros 601")
-            Terminal.print("4. 🚀 Contrôle Asterisk (Start/Stop/Restart)")
-            Terminal.print("5. 🔐 Gestion des codes d'accès")
-            Terminal.print("6. 🔍 Vérification système")
-            Terminal.print("7. ⚙️  Installation/Réparation système")
-            Terminal.print("8. 🗄️  Gestion des bases de données")
-            Terminal.print("9. 🔄 Revalider le code d'accès")
-            Terminal.print("0. 🚪 Quitter")
-            
             choice = Terminal.input("\nVotre choix: ")
             
-            if choice == "1":
-                self.configuration_menu()
-            elif choice == "2":
-                self.users_menu()
-            elif choice == "3":
-                self.numbers_menu()
-            elif choice == "4":
-                self.asterisk_control_menu()
-            elif choice == "5":
-                self.access_codes_menu()
-            elif choice == "6":
-                self.system_check_menu()
-            elif choice == "7":
-                self.system_install_menu()
-            elif choice == "8":
-                self.database_management_menu()
-            elif choice == "9":
-                # Revalidation du code
-                if not self.access_validator.check_and_validate_access():
-                    Terminal.print("❌ Revalidation échouée. Retour au menu principal.")
-                    Terminal.input("Appuyez sur Entrée pour continuer...")
-            elif choice == "0":
+            if choice == "0":
                 Terminal.print("Au revoir!")
                 sys.exit(0)
+            
+            handler = self._main_dispatch.get(choice)
+            if handler:
+                AsteriskManager.pause_status_poller()
+                try:
+                    dirty = handler()
+                finally:
+                    AsteriskManager.start_status_poller()
             else:
                 Terminal.print("❌ Choix invalide")
                 Terminal.input("Appuyez sur Entrée pour continuer...")
+                dirty = 0
+            
+            # Un seul rafraîchissement même si plusieurs choix ont été tapés d'avance.
+            # Après un choix invalide (dirty = 0) seul le statut Asterisk est relu,
+            # depuis le cache du thread de fond
+            Terminal.drain_input()
+            self.draw_main_menu(ALL_DIRTY if dirty is None else dirty)
+    
+    def revalidate_access(self):
+        """Revalidation du code d'accès depuis le menu principal"""
+        if not self.access_validator.check_and_validate_access():
+            Terminal.print("❌ Revalidation échouée. Retour au menu principal.")
+            Terminal.input("Appuyez sur Entrée pour continuer...")
+        return CODE_DIRTY
+    
+    def draw_main_menu(self, dirty=ALL_DIRTY):
+        """Afficher le menu principal avec l'état courant (statut, code, utilisateurs)"""
+        sections = self._main_sections
+        code_data = sections.get('code')
+        # Relire le code s'il a pu changer ou s'il a expiré (changement de mois)
+        if (dirty & CODE_DIRTY or 'code' not in sections
+                or (code_data and code_data['expires_at'] < datetime.now())):
+            code_data = sections['code'] = DatabaseManager.get_current_access_code()
+        if dirty & USERS_DIRTY or 'users' not in sections:
+            sections['users'] = f"Utilisateurs configurés: {self.user_manager.count_users()}"
+        
+        # Statut toujours relu: servi par le thread de fond, il peut changer à tout moment
+        status = "✅ EN COURS" if self.asterisk_manager.is_running() else "❌ ARRÊTÉ"
+        buf = [f"Statut Asterisk: {status}"]
+        # Lignes du code recalculées à chaque rendu (jours restants), sans requête
+        buf += self.code_manager.code_status_lines(code_data)
+        buf.append(sections['users'])
+        buf += MAIN_MENU_OPTIONS
+        self.show_header(buf)
     
     def configuration_menu(self):
-        self.show_header()
-        Terminal.print("🔧 CONFIGURATION ASTERISK AUTOMATIQUE")
-        Terminal.print("")
-        
-        Terminal.print("Cette configuration va:")
-        Terminal.print("✅ Créer les fichiers de configuration Asterisk")
-        Terminal.print("✅ Configurer les utilisateurs existants")
-        Terminal.print("✅ Recharger la configuration Asterisk")
-        Terminal.print("")
+        self.show_header(CONFIGURATION_SCREEN)
         
         confirm = Terminal.input("Confirmer la configuration? (o/N): ").strip().lower()
         
-        if confirm == 'o' or confirm == 'oui':
+        if confirm in YES_ANSWERS:
             if self.configurator.configure_asterisk():
                 Terminal.print("✅ Configuration terminée avec succès")
             else:
@@ -1311,47 +1795,62 @@ class CompleteMenuManager:
             Terminal.print("❌ Configuration annulée")
         
         Terminal.input("\nAppuyez sur Entrée pour continuer...")
+        return 0
     
-    def users_menu(self):
+    def run_submenu(self, draw, dispatch, result, pause_after_choice=False):
+        """Boucle commune des sous-menus: dessiner, lire un choix, l'exécuter ("0" = retour)
+        
+        `result` est renvoyé au menu principal (parties à recalculer).
+        """
+        drawn_epoch = None
         while True:
-            self.show_header()
-            Terminal.print("👥 GESTION DES UTILISATEURS")
-            Terminal.print("")
-            
-            users = self.user_manager.list_users()
-            if users:
-                Terminal.print("Utilisateurs existants:")
-                for i, user in enumerate(users, 1):
-                    numero, context, created_at = user
-                    Terminal.print(f"  {i}. {numero} (Contexte: {context}) - Créé le: {created_at}")
+            if self.render_epoch != drawn_epoch or not Terminal.can_redraw():
+                draw()
+                drawn_epoch = self.render_epoch
             else:
-                Terminal.print("Aucun utilisateur configuré")
-            
-            Terminal.print(f"\n1. ➕ Ajouter un utilisateur")
-            Terminal.print("2. 🗑️  Supprimer un utilisateur")
-            Terminal.print("3. 🔄 Reconfigurer Asterisk")
-            Terminal.print("0. ↩️  Retour")
-            
+                Terminal.redraw()
             choice = Terminal.input("\nVotre choix: ")
             
-            if choice == "1":
-                self.add_user_menu()
-            elif choice == "2":
-                self.delete_user_menu(users)
-            elif choice == "3":
-                self.configurator.configure_asterisk()
-                Terminal.print("✅ Asterisk reconfiguré avec les utilisateurs actuels")
-                Terminal.input("Appuyez sur Entrée pour continuer...")
-            elif choice == "0":
-                return
+            if choice == "0":
+                return result
+            
+            handler = dispatch.get(choice)
+            if handler:
+                handler()
+                self.render_epoch += 1
             else:
                 Terminal.print("❌ Choix invalide")
-                Terminal.input("Appuyez sur Entrée pour continuer...")
+                if not pause_after_choice:
+                    Terminal.input("Appuyez sur Entrée pour continuer...")
+            
+            if pause_after_choice:
+                Terminal.input("\nAppuyez sur Entrée pour continuer...")
+    
+    def users_menu(self):
+        return self.run_submenu(self.draw_users_menu, self._users_dispatch, USERS_DIRTY)
+    
+    def draw_users_menu(self):
+        buf = ["👥 GESTION DES UTILISATEURS", ""]
+        
+        users = self.user_manager.list_users()
+        if users:
+            buf.append("Utilisateurs existants:")
+            for i, user in enumerate(users, 1):
+                numero, context, created_at = user
+                buf.append(f"  {i}. {numero} (Contexte: {context}) - Créé le: {created_at}")
+        else:
+            buf.append("Aucun utilisateur configuré")
+        
+        buf += USERS_MENU_OPTIONS
+        self.show_header(buf)
+    
+    def reconfigure_users(self):
+        self.configurator.configure_asterisk()
+        Terminal.print("✅ Asterisk reconfiguré avec les utilisateurs actuels")
+        Terminal.input("Appuyez sur Entrée pour continuer...")
     
     def add_user_menu(self):
-        self.show_header()
-        Terminal.print("➕ AJOUT D'UTILISATEUR")
-        Terminal.print("")
+        self.show_header(["➕ AJOUT D'UTILISATEUR", ""])
         
         password = Terminal.input("Mot de passe pour l'utilisateur: ")
         context = Terminal.input("Contexte [from-internal]: ") or "from-internal"
@@ -1369,20 +1868,19 @@ class CompleteMenuManager:
         
         Terminal.input("\nAppuyez sur Entrée pour continuer...")
     
-    def delete_user_menu(self, users):
+    def delete_user_menu(self):
+        # Liste servie par le cache de UserManager (celle affichée par le menu)
+        users = self.user_manager.list_users()
         if not users:
             Terminal.print("❌ Aucun utilisateur à supprimer")
             Terminal.input("Appuyez sur Entrée pour continuer...")
             return
         
-        self.show_header()
-        Terminal.print("🗑️  SUPPRESSION D'UTILISATEUR")
-        Terminal.print("")
-        
-        Terminal.print("Utilisateurs existants:")
+        buf = ["🗑️  SUPPRESSION D'UTILISATEUR", "", "Utilisateurs existants:"]
         for i, user in enumerate(users, 1):
             numero, context, _ = user
-            Terminal.print(f"  {i}. {numero}")
+            buf.append(f"  {i}. {numero}")
+        self.show_header(buf)
         
         try:
             choice = int(Terminal.input("\nNuméro de l'utilisateur à supprimer (0 pour annuler): "))
@@ -1393,7 +1891,7 @@ class CompleteMenuManager:
                 phone_number = users[choice-1][0]
                 confirm = Terminal.input(f"Confirmer la suppression de {phone_number}? (o/N): ").strip().lower()
                 
-                if confirm == 'o' or confirm == 'oui':
+                if confirm in YES_ANSWERS:
                     if self.user_manager.delete_user(phone_number):
                         Terminal.print("🔄 Mise à jour de la configuration Asterisk...")
                         self.configurator.configure_asterisk()
@@ -1407,119 +1905,66 @@ class CompleteMenuManager:
         Terminal.input("\nAppuyez sur Entrée pour continuer...")
     
     def numbers_menu(self):
-        self.show_header()
-        Terminal.print("📞 GESTION DES NUMÉROS 601")
-        Terminal.print("")
+        buf = ["📞 GESTION DES NUMÉROS 601", ""]
         
         users = self.user_manager.list_users()
         if users:
-            Terminal.print("Numéros 601 attribués:")
+            buf.append("Numéros 601 attribués:")
             for user in users:
                 numero, context, created_at = user
-                Terminal.print(f"  📞 {numero} (Contexte: {context})")
+                buf.append(f"  📞 {numero} (Contexte: {context})")
         else:
-            Terminal.print("Aucun numéro 601 attribué")
+            buf.append("Aucun numéro 601 attribué")
         
-        Terminal.print(f"\nFormat: {Config.EXTENSION_PREFIX}XXXXXX (9 chiffres)")
-        Terminal.print("Génération automatique à chaque nouvel utilisateur")
+        buf += NUMBERS_FORMAT_LINES
+        self.show_header(buf)
         
         Terminal.input("\nAppuyez sur Entrée pour continuer...")
+        return 0
     
     def asterisk_control_menu(self):
-        while True:
-            self.show_header()
-            Terminal.print("🚀 CONTRÔLE ASTERISK")
-            Terminal.print("")
-            
-            status = "✅ EN COURS" if self.asterisk_manager.is_running() else "❌ ARRÊTÉ"
-            Terminal.print(f"Statut actuel: {status}")
-            
-            Terminal.print(f"\n1. ▶️  Démarrer Asterisk (service start)")
-            Terminal.print("2. ⏹️  Arrêter Asterisk (service stop)")
-            Terminal.print("3. 🔄 Redémarrer Asterisk (service restart)")
-            Terminal.print("4. 🔃 Recharger configuration (service reload)")
-            Terminal.print("5. 📊 Statut détaillé")
-            Terminal.print("0. ↩️  Retour")
-            
-            choice = Terminal.input("\nVotre choix: ")
-            
-            if choice == "1":
-                self.asterisk_manager.start()
-            elif choice == "2":
-                self.asterisk_manager.stop()
-            elif choice == "3":
-                self.asterisk_manager.restart()
-            elif choice == "4":
-                self.asterisk_manager.reload()
-            elif choice == "5":
-                self.show_asterisk_status()
-            elif choice == "0":
-                return
-            else:
-                Terminal.print("❌ Choix invalide")
-            
-            Terminal.input("\nAppuyez sur Entrée pour continuer...")
+        return self.run_submenu(self.draw_asterisk_control_menu, self._asterisk_dispatch, 0,
+                                pause_after_choice=True)
+    
+    def draw_asterisk_control_menu(self):
+        status = "✅ EN COURS" if self.asterisk_manager.is_running() else "❌ ARRÊTÉ"
+        self.show_header(["🚀 CONTRÔLE ASTERISK", "", f"Statut actuel: {status}", *ASTERISK_CONTROL_OPTIONS])
     
     def show_asterisk_status(self):
-        self.show_header()
-        Terminal.print("📊 STATUT DÉTAILLÉ ASTERISK")
-        Terminal.print("")
+        buf = ["📊 STATUT DÉTAILLÉ ASTERISK", ""]
         
         if self.asterisk_manager.is_running():
-            Terminal.print("✅ Asterisk est en cours d'exécution")
+            buf.append("✅ Asterisk est en cours d'exécution")
             
             try:
-                result = subprocess.run(['systemctl', 'status', 'asterisk'], 
+                # Journal limité côté systemctl: seules les 10 premières lignes sont affichées
+                result = subprocess.run(['systemctl', 'status', 'asterisk', '--no-pager', '-n', '0'],
                                       capture_output=True, text=True, timeout=5)
                 if result.returncode == 0:
-                    lines = result.stdout.split('\n')
-                    for line in lines[:10]:
+                    for line in result.stdout.splitlines()[:10]:
                         if line.strip():
-                            Terminal.print(f"   {line}")
+                            buf.append(f"   {line}")
             except Exception as e:
-                Terminal.print(f"❌ Erreur récupération statut: {e}")
+                buf.append(f"❌ Erreur récupération statut: {e}")
         else:
-            Terminal.print("❌ Asterisk n'est pas en cours d'exécution")
+            buf.append("❌ Asterisk n'est pas en cours d'exécution")
+        
+        self.show_header(buf)
     
     def access_codes_menu(self):
-        while True:
-            self.show_header()
-            Terminal.print("🔐 GESTION DES CODES D'ACCÈS")
-            Terminal.print("")
-            
-            self.code_manager.display_code_status()
-            
-            Terminal.print(f"\n1. 🔄 Régénérer le code")
-            Terminal.print("2. ✅ Valider un code")
-            Terminal.print("3. 🔍 Afficher le code actuel (DEBUG)")
-            Terminal.print("0. ↩️  Retour")
-            
-            choice = Terminal.input("\nVotre choix: ")
-            
-            if choice == "1":
-                self.regenerate_code()
-            elif choice == "2":
-                self.validate_code_menu()
-            elif choice == "3":
-                self.show_current_code_debug()
-            elif choice == "0":
-                return
-            else:
-                Terminal.print("❌ Choix invalide")
-                Terminal.input("Appuyez sur Entrée pour continuer...")
+        return self.run_submenu(self.draw_access_codes_menu, self._access_codes_dispatch, CODE_DIRTY)
+    
+    def draw_access_codes_menu(self):
+        buf = ["🔐 GESTION DES CODES D'ACCÈS", ""]
+        buf += self.code_manager.code_status_lines(DatabaseManager.get_current_access_code())
+        buf += ACCESS_CODES_OPTIONS
+        self.show_header(buf)
     
     def regenerate_code(self):
         current_date = datetime.now()
         month_year = self.code_manager.get_current_period()
         new_code = self.code_manager.generate_deterministic_code(month_year)
-        
-        if current_date.month == 12:
-            next_month = datetime(current_date.year + 1, 1, 1)
-        else:
-            next_month = datetime(current_date.year, current_date.month + 1, 1)
-        
-        expires_at = next_month - timedelta(days=1)
-        expires_at = expires_at.replace(hour=23, minute=59, second=59)
+        expires_at = _month_expiry(current_date.year, current_date.month)
         
         if DatabaseManager.update_access_code(new_code, month_year, expires_at):
             month_name = self.code_manager.month_names[current_date.month]
@@ -1531,9 +1976,7 @@ class CompleteMenuManager:
         Terminal.input("\nAppuyez sur Entrée pour continuer...")
     
     def validate_code_menu(self):
-        self.show_header()
-        Terminal.print("🔐 VALIDATION DE CODE")
-        Terminal.print("")
+        self.show_header(["🔐 VALIDATION DE CODE", ""])
         
         test_code = Terminal.getpass("Code à valider: ").strip().upper()
         
@@ -1546,119 +1989,101 @@ class CompleteMenuManager:
     
     def show_current_code_debug(self):
         """Fonction de debug pour afficher le code actuel (à usage administratif)"""
-        self.show_header()
-        Terminal.print("🔍 AFFICHAGE DU CODE (DEBUG)")
-        Terminal.print("")
+        buf = ["🔍 AFFICHAGE DU CODE (DEBUG)", ""]
         
         code_data = DatabaseManager.get_current_access_code()
         if code_data:
-            month_year = code_data['month_year']
-            month_num = int(month_year.split('-')[0])
-            month_name = self.code_manager.month_names.get(month_num, "Inconnu")
-            year = month_year.split('-')[1]
-            
-            Terminal.print(f"📅 Période: {month_name} {year}")
-            Terminal.print(f"🔑 Code: {code_data['code']}")
-            Terminal.print(f"⏰ Expire le: {code_data['expires_at'].strftime('%d/%m/%Y à %H:%M:%S')}")
+            month_name, year = period_display(code_data['month_year'])
+            
+            buf += [
+                f"📅 Période: {month_name} {year}",
+                f"🔑 Code: {code_data['code']}",
+                f"⏰ Expire le: {code_data['expires_at'].strftime('%d/%m/%Y à %H:%M:%S')}",
+            ]
         else:
-            Terminal.print("❌ Aucun code trouvé")
+            buf.append("❌ Aucun code trouvé")
+        
+        self.show_header(buf)
         
         Terminal.input("\nAppuyez sur Entrée pour continuer...")
     
     def system_check_menu(self):
-        self.show_header()
-        Terminal.print("🔍 VÉRIFICATION SYSTÈME")
-        Terminal.print("")
-        
         asterisk_ok = self.asterisk_manager.is_running()
-        Terminal.print(f"Asterisk: {'✅' if asterisk_ok else '❌'} {'EN COURS' if asterisk_ok else 'ARRÊTÉ'}")
-        
         code_expired = self.code_manager.is_code_expired()
-        Terminal.print(f"Code d'accès: {'❌ EXPIRÉ' if code_expired else '✅ VALIDE'}")
-        
-        users = self.user_manager.list_users()
-        Terminal.print(f"Utilisateurs: {len(users)} configuré(s)")
         
         try:
-            conn = sqlite3.connect(Config.DB_PATH)
-            conn.close()
-            Terminal.print("Base de données: ✅ ACCESSIBLE")
+            # Connexion partagée: pas d'ouverture/fermeture de fichier à chaque vérification
+            DatabaseManager.conn().execute("SELECT 1")
+            db_ok = True
         except:
-            Terminal.print("Base de données: ❌ INACCESSIBLE")
+            db_ok = False
         
-        Terminal.print(f"\nStatut global: {'✅ OPÉRATIONNEL' if asterisk_ok and not code_expired else '❌ PROBLÈME'}")
+        self.show_header([SYSTEM_CHECK_TEMPLATE.format_map({
+            'asterisk': "✅ EN COURS" if asterisk_ok else "❌ ARRÊTÉ",
+            'code': "❌ EXPIRÉ" if code_expired else "✅ VALIDE",
+            'users': self.user_manager.count_users(),
+            'database': "✅ ACCESSIBLE" if db_ok else "❌ INACCESSIBLE",
+            'overall': "✅ OPÉRATIONNEL" if asterisk_ok and not code_expired else "❌ PROBLÈME",
+        })])
         
         Terminal.input("\nAppuyez sur Entrée pour continuer...")
+        return 0
     
     def system_install_menu(self):
-        self.show_header()
-        Terminal.print("⚙️  INSTALLATION ET RÉPARATION SYSTÈME")
-        Terminal.print("")
-        
-        Terminal.print("Options disponibles:")
-        Terminal.print("1. 🔍 Vérifier l'état du système")
-        Terminal.print("2. 📦 Installer les paquets manquants")
-        Terminal.print("3. 🔥 Configurer le firewall (alternative)")
-        Terminal.print("4. 📞 Configurer le service Asterisk")
-        Terminal.print("5. 🚀 Installation complète automatique")
-        Terminal.print("0. ↩️  Retour")
+        self.show_header(SYSTEM_INSTALL_SCREEN)
         
         choice = Terminal.input("\nVotre choix: ")
         
-        if choice == "1":
-            SystemChecker.check_system_requirements()
-        elif choice == "2":
-            SystemInstaller.check_and_install_packages()
-        elif choice == "3":
-            SystemInstaller.configure_firewall_alternative()
-        elif choice == "4":
-            SystemInstaller.setup_asterisk()
-        elif choice == "5":
-            SystemInstaller.full_system_install()
-        elif choice == "0":
+        if choice == "0":
             return
+        
+        handler = self._install_dispatch.get(choice)
+        if handler:
+            handler()
         else:
             Terminal.print("❌ Choix invalide")
         
         Terminal.input("\nAppuyez sur Entrée pour continuer...")
     
+    @staticmethod
+    def _database_entries():
+        """Entrées (os.DirEntry) des bases présentes, par chemin: une lecture par répertoire"""
+        entries = {}
+        for directory in {os.path.dirname(path) for _, path in DATABASES}:
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        entries[entry.path] = entry
+            except FileNotFoundError:
+                pass
+        return entries
+    
     def database_management_menu(self):
         """Menu de gestion des bases de données"""
-        self.show_header()
-        Terminal.print("🗄️  GESTION DES BASES DE DONNÉES")
-        Terminal.print("")
-        
-        # Vérifier le statut des bases
-        databases = [
-            ("Principale", Config.DB_PATH),
-            ("Codes d'accès", "/home/vps/asterisk/access_codes.db"),
-            ("Logs système", "/home/vps/asterisk/system_logs.db"),
-            ("CDR", "/home/vps/asterisk/cdr.db"),
-            ("Configuration", "/home/vps/asterisk/config.db")
-        ]
-        
-        Terminal.print("📊 STATUT DES BASES:")
-        for name, path in databases:
-            if os.path.exists(path):
-                size = os.path.getsize(path)
-                size_kb = size / 1024
-                Terminal.print(f"  ✅ {name}: {size_kb:.1f} KB")
+        buf = ["🗄️  GESTION DES BASES DE DONNÉES", ""]
+        
+        # Vérifier le statut des bases (existence par le répertoire, stat des seules bases présentes)
+        buf.append("📊 STATUT DES BASES:")
+        entries = self._database_entries()
+        for name, path in DATABASES:
+            entry = entries.get(path)
+            if entry:
+                size_kb = entry.stat().st_size / 1024
+                buf.append(f"  ✅ {name}: {size_kb:.1f} KB")
             else:
-                Terminal.print(f"  ❌ {name}: NON CRÉÉE")
+                buf.append(f"  ❌ {name}: NON CRÉÉE")
         
-        Terminal.print(f"\n🔧 OPTIONS:")
-        Terminal.print("1. 🔄 Recréer toutes les bases")
-        Terminal.print("2. 🗑️  Supprimer une base")
-        Terminal.print("0. ↩️  Retour")
+        buf += DATABASE_MENU_OPTIONS
+        self.show_header(buf)
         
         choice = Terminal.input("\nVotre choix: ")
         
-        if choice == "1":
-            self.recreate_all_databases()
-        elif choice == "2":
-            self.delete_database_menu()
-        elif choice == "0":
+        if choice == "0":
             return
+        
+        handler = self._database_dispatch.get(choice)
+        if handler:
+            handler()
         else:
             Terminal.print("❌ Choix invalide")
         
@@ -1666,19 +2091,11 @@ class CompleteMenuManager:
     
     def recreate_all_databases(self):
         """Recréer toutes les bases de données"""
-        self.show_header()
-        Terminal.print("🔄 RECRÉATION DE TOUTES LES BASES")
-        Terminal.print("")
-        
-        Terminal.print("Cette action va:")
-        Terminal.print("✅ Recréer toutes les bases de données")
-        Terminal.print("✅ Conserver la structure et les données")
-        Terminal.print("✅ Régénérer les codes d'accès")
-        Terminal.print("")
+        self.show_header(RECREATE_DATABASES_SCREEN)
         
         confirm = Terminal.input("Confirmer la recréation? (o/N): ").strip().lower()
         
-        if confirm in ['o', 'oui', 'y', 'yes']:
+        if confirm in YES_ANSWERS:
             if DatabaseManager.ensure_all_databases():
                 Terminal.print("✅ Toutes les bases de données recréées avec succès")
             else:
@@ -1688,37 +2105,32 @@ class CompleteMenuManager:
     
     def delete_database_menu(self):
         """Menu de suppression d'une base de données"""
-        self.show_header()
-        Terminal.print("🗑️  SUPPRESSION D'UNE BASE DE DONNÉES")
-        Terminal.print("")
-        
-        Terminal.print("⚠️  ATTENTION: Cette action est irréversible!")
-        Terminal.print("")
-        
-        databases = [
-            ("1", "Principale", Config.DB_PATH),
-            ("2", "Codes d'accès", "/home/vps/asterisk/access_codes.db"),
-            ("3", "Logs système", "/home/vps/asterisk/system_logs.db"),
-            ("4", "CDR", "/home/vps/asterisk/cdr.db"),
-            ("5", "Configuration", "/home/vps/asterisk/config.db")
+        buf = [
+            "🗑️  SUPPRESSION D'UNE BASE DE DONNÉES",
+            "",
+            "⚠️  ATTENTION: Cette action est irréversible!",
+            "",
         ]
         
-        Terminal.print("📋 BASES DISPONIBLES:")
-        for key, name, path in databases:
-            exists = "✅" if os.path.exists(path) else "❌"
-            Terminal.print(f"  {key}. {name} {exists}")
+        buf.append("📋 BASES DISPONIBLES:")
+        entries = self._database_entries()
+        for key, name, path in DATABASES_INDEXED:
+            exists = "✅" if path in entries else "❌"
+            buf.append(f"  {key}. {name} {exists}")
+        self.show_header(buf)
         
         choice = Terminal.input("\n🎯 Choisir la base à supprimer (0 pour annuler): ")
         
         if choice == "0":
             return
         
-        for key, name, path in databases:
+        for key, name, path in DATABASES_INDEXED:
             if choice == key:
                 if os.path.exists(path):
                     confirm = Terminal.input(f"❓ CONFIRMER la suppression de {name}? (écrire 'SUPPRIMER'): ")
                     if confirm == "SUPPRIMER":
                         try:
+                            DatabaseManager.close_connection()
                             os.remove(path)
                             Terminal.print(f"✅ Base {name} supprimée")
                         except Exception as e:
@@ -1752,6 +2164,9 @@ def main():
             Terminal.print("💡 Utilisez: sudo python3 asterisk_manager.py")
             sys.exit(1)
         
+        # Fichiers créés en 0644 (bases de données, configuration)
+        os.umask(0o022)
+        
         # CRÉATION AUTOMATIQUE DES BASES DE DONNÉES
         Logger.info("Création automatique des bases de données...")
         DatabaseManager.ensure_all_databases()